@@ -6,24 +6,19 @@ https://opensource.org/licenses/mit-license.php
 """
 
 import os
+import sys
 import traceback
-from typing import Set, Tuple
+from typing import Any, Dict, Optional, Set, Tuple
 
 import bpy
 from bpy.app.handlers import persistent
 from bpy_extras.io_utils import ExportHelper, ImportHelper
 
 from . import vrm_types
-from .importer import blend_model, vrm_load
-from .misc import (
-    detail_mesh_maker,
-    glb_factory,
-    glsl_drawer,
-    make_armature,
-    mesh_from_bone_envelopes,
-    version,
-    vrm_helper,
-)
+
+# The importer and the exporter are imported in the operators that use them
+# to minimize the addon enable time
+from .misc import glsl_drawer, make_armature, version, vrm_helper
 from .misc.glsl_drawer import GlslDrawObj
 from .misc.preferences import get_preferences
 
@@ -54,6 +49,10 @@ class LicenseConfirmation(bpy.types.PropertyGroup):
     json_key: bpy.props.StringProperty()  # type: ignore[valid-type]
 
 
+# {filepath: (mtime, parse_glb() result)} waiting for WM_OT_licenseConfirmation
+license_confirmation_pending_glbs: Dict[str, Tuple[float, Tuple[Any, bytes]]] = {}
+
+
 class ImportVRM(bpy.types.Operator, ImportHelper):
     bl_idname = "import_scene.vrm"
     bl_label = "Import VRM"
@@ -88,6 +87,10 @@ class ImportVRM(bpy.types.Operator, ImportHelper):
     )
 
     def execute(self, context):
+        from .importer import vrm_load
+
+        # Only the file waiting for the latest confirmation is kept
+        license_confirmation_pending_glbs.clear()
         license_error = None
         try:
             return create_blend_model(
@@ -105,6 +108,12 @@ class ImportVRM(bpy.types.Operator, ImportHelper):
 
         print(license_error.description())
 
+        # Keep the parsed file to skip parsing it again after the confirmation
+        license_confirmation_pending_glbs[self.filepath] = (
+            os.path.getmtime(self.filepath),
+            license_error.parsed_glb,
+        )
+
         execution_context = "INVOKE_DEFAULT"
         import_anyway = False
         if os.environ.get("BLENDER_VRM_AUTOMATIC_LICENSE_CONFIRMATION") == "true":
@@ -127,6 +136,8 @@ class ImportVRM(bpy.types.Operator, ImportHelper):
 
 
 def create_blend_model(addon, context, vrm_pydata: vrm_types.VrmPydata) -> Set[str]:
+    from .importer import blend_model
+
     has_ui_localization = bpy.app.version < (2, 83)
     ui_localization = False
     if has_ui_localization:
@@ -191,20 +202,27 @@ class ExportVRM(bpy.types.Operator, ExportHelper):
     )
 
     def execute(self, context: bpy.types.Context) -> Set[str]:
+        from .misc import glb_factory
+
         if not self.filepath:
             return {"CANCELLED"}
         filepath: str = self.filepath
 
+        # GlbObj runs the VRM validator operator
+        register_deferred_classes()
+
         try:
             glb_obj = glb_factory.GlbObj(
                 bool(self.export_invisibles), bool(self.export_only_selections)
             )
         except glb_factory.GlbObj.ValidationError:
             return {"CANCELLED"}
-        # vrm_bin =  glb_obj().convert_bpy2glb(self.vrm_version)
-        vrm_bin = glb_obj.convert_bpy2glb("0.0")
-        with open(filepath, "wb") as f:
-            f.write(vrm_bin)
+        # glb_chunks = glb_obj.convert_bpy2glb_chunks(self.vrm_version)
+        # Convert everything before opening the file, so that a failed export
+        # does not truncate the file written by the previous one
+        glb_chunks = glb_obj.convert_bpy2glb_chunks("0.0")
+        with open(filepath, "wb", buffering=1024 * 1024) as f:
+            f.writelines(glb_chunks)
         return {"FINISHED"}
 
     def invoke(self, context: bpy.types.Context, event: bpy.types.Event):
@@ -226,6 +244,8 @@ def add_armature(self, context):
 
 
 def make_mesh(self, context):
+    from .misc import detail_mesh_maker, mesh_from_bone_envelopes
+
     self.layout.separator()
     self.layout.operator(
         mesh_from_bone_envelopes.ICYP_OT_MAKE_MESH_FROM_BONE_ENVELOPES.bl_idname,
@@ -254,6 +274,7 @@ class VRM_IMPORTER_PT_controller(bpy.types.Panel):  # noqa: N801
     def draw(self, context):
         # region helper
         def armature_ui():
+            armature_data = context.active_object.data
             self.layout.separator()
             armature_box = self.layout.row(align=False).box()
             armature_box.label(text="Armature Help")
@@ -264,11 +285,11 @@ class VRM_IMPORTER_PT_controller(bpy.types.Panel):  # noqa: N801
             requires_row = requires_box.row()
             requires_row.label(text="VRM Required Bones")
             for req in vrm_types.HumanBones.requires:
-                if req in context.active_object.data:
+                if req in armature_data:
                     requires_box.prop_search(
-                        context.active_object.data,
+                        armature_data,
                         f'["{req}"]',
-                        context.active_object.data,
+                        armature_data,
                         "bones",
                         text=req,
                     )
@@ -280,11 +301,11 @@ class VRM_IMPORTER_PT_controller(bpy.types.Panel):  # noqa: N801
             defines_box = armature_box.box()
             defines_box.label(text="VRM Optional Bones")
             for defs in vrm_types.HumanBones.defines:
-                if defs in context.active_object.data:
+                if defs in armature_data:
                     defines_box.prop_search(
-                        context.active_object.data,
+                        armature_data,
                         f'["{defs}"]',
-                        context.active_object.data,
+                        armature_data,
                         "bones",
                         text=defs,
                     )
@@ -336,7 +357,7 @@ class VRM_IMPORTER_PT_controller(bpy.types.Panel):  # noqa: N801
             vrm_validator_prop.show_successful_message = True
             # vrm_validator_prop.errors = []  # これはできない
             object_mode_box.label(text="MToon preview")
-            if [obj for obj in bpy.data.objects if obj.type == "LIGHT"]:
+            if scene_has_light():
                 object_mode_box.operator(glsl_drawer.ICYP_OT_Draw_Model.bl_idname)
             else:
                 object_mode_box.box().label(
@@ -387,8 +408,18 @@ class WM_OT_licenseConfirmation(bpy.types.Operator):  # noqa: N801
     use_in_blender: bpy.props.BoolProperty()  # type: ignore[valid-type]
 
     def execute(self, context: bpy.types.Context):
+        pending_glb = license_confirmation_pending_glbs.pop(self.filepath, None)
         if not self.import_anyway:
             return {"CANCELLED"}
+
+        from .importer import vrm_load
+
+        parsed_glb = None
+        if pending_glb is not None:
+            mtime, parsed_glb = pending_glb
+            if mtime != os.path.getmtime(self.filepath):
+                parsed_glb = None
+
         return create_blend_model(
             self,
             context,
@@ -397,12 +428,16 @@ class WM_OT_licenseConfirmation(bpy.types.Operator):  # noqa: N801
                 self.make_new_texture_folder,
                 self.use_simple_principled_material,
                 license_check=False,
+                parsed_glb=parsed_glb,
             ),
         )
 
     def invoke(self, context: bpy.types.Context, event: bpy.types.Event):
         return context.window_manager.invoke_props_dialog(self, width=600)
 
+    def cancel(self, context: bpy.types.Context) -> None:
+        license_confirmation_pending_glbs.pop(self.filepath, None)
+
     def draw(self, context: bpy.types.Context):
         layout = self.layout
         layout.label(text=self.filepath)
@@ -429,25 +464,60 @@ class WM_OT_licenseConfirmation(bpy.types.Operator):  # noqa: N801
         )
 
 
+# Node group names in material_node_groups.blend. Filled by the first add_shaders()
+material_node_group_names: Set[str] = set()
+
 if persistent:  # for fake-bpy-modules
 
     @persistent
     def add_shaders(self):
+        if material_node_group_names and material_node_group_names.issubset(
+            {node_group.name for node_group in bpy.data.node_groups}
+        ):
+            return
         filedir = os.path.join(
             os.path.dirname(__file__), "resources", "material_node_groups.blend"
         )
         with bpy.data.libraries.load(filedir, link=False) as (data_from, data_to):
+            material_node_group_names.update(data_from.node_groups)
             for nt in data_from.node_groups:
                 if nt not in bpy.data.node_groups:
                     data_to.node_groups.append(nt)
 
 
-classes = [
+# Whether bpy.data has a light. None means not computed yet
+light_existence: Dict[str, Optional[bool]] = {"has_light": None}
+
+
+def scene_has_light() -> bool:
+    has_light = light_existence["has_light"]
+    if has_light is None:
+        has_light = any(obj.type == "LIGHT" for obj in bpy.data.objects)
+        light_existence["has_light"] = has_light
+    return has_light
+
+
+if persistent:  # for fake-bpy-modules
+
+    @persistent
+    def invalidate_light_existence(*args):
+        light_existence["has_light"] = None
+
+    @persistent
+    def clear_license_confirmation_pending_glbs(*args):
+        license_confirmation_pending_glbs.clear()
+
+
+classes = (
     VrmAddonPreferences,
     LicenseConfirmation,
     WM_OT_licenseConfirmation,
     ImportVRM,
     ExportVRM,
+)
+
+# Registered after the first event loop tick to keep enabling the addon responsive
+deferred_classes = (
     vrm_helper.Bones_rename,
     vrm_helper.Add_VRM_extensions_to_armature,
     vrm_helper.Add_VRM_require_humanbone_custom_property,
@@ -463,7 +533,7 @@ classes = [
     # detail_mesh_maker.ICYP_OT_DETAIL_MESH_MAKER,
     # blend_model.ICYP_OT_select_helper,
     # mesh_from_bone_envelopes.ICYP_OT_MAKE_MESH_FROM_BONE_ENVELOPES
-]
+)
 
 translation_dictionary = {
     "ja_JP": {
@@ -477,6 +547,12 @@ translation_dictionary = {
 }
 
 
+def register_deferred_classes() -> None:
+    for cls in deferred_classes:
+        if not cls.is_registered:
+            bpy.utils.register_class(cls)
+
+
 # アドオン有効化時の処理
 def register(init_version: Tuple[int, int, int]):
     # Sanity check
@@ -485,29 +561,52 @@ def register(init_version: Tuple[int, int, int]):
 
     for cls in classes:
         bpy.utils.register_class(cls)
+    if bpy.app.background:
+        register_deferred_classes()
+    else:
+        # persistent=True keeps the timer when a .blend file is loaded before it runs
+        bpy.app.timers.register(
+            register_deferred_classes, first_interval=0.0, persistent=True
+        )
     bpy.types.TOPBAR_MT_file_import.append(menu_import)
     bpy.types.TOPBAR_MT_file_export.append(menu_export)
     bpy.types.VIEW3D_MT_armature_add.append(add_armature)
     # bpy.types.VIEW3D_MT_mesh_add.append(make_mesh)
     bpy.app.handlers.load_post.append(add_shaders)
+    bpy.app.handlers.load_post.append(invalidate_light_existence)
+    bpy.app.handlers.load_post.append(clear_license_confirmation_pending_glbs)
+    bpy.app.handlers.depsgraph_update_post.append(invalidate_light_existence)
     bpy.app.translations.register(addon_package_name, translation_dictionary)
 
 
 # アドオン無効化時の処理
 def unregister():
     bpy.app.translations.unregister(addon_package_name)
+    bpy.app.handlers.depsgraph_update_post.remove(invalidate_light_existence)
+    bpy.app.handlers.load_post.remove(clear_license_confirmation_pending_glbs)
+    license_confirmation_pending_glbs.clear()
+    bpy.app.handlers.load_post.remove(invalidate_light_existence)
     bpy.app.handlers.load_post.remove(add_shaders)
     bpy.types.VIEW3D_MT_armature_add.remove(add_armature)
     # bpy.types.VIEW3D_MT_mesh_add.remove(make_mesh)
     bpy.types.TOPBAR_MT_file_import.remove(menu_export)
     bpy.types.TOPBAR_MT_file_export.remove(menu_import)
+    if bpy.app.timers.is_registered(register_deferred_classes):
+        bpy.app.timers.unregister(register_deferred_classes)
+    registered_classes = classes + tuple(
+        cls for cls in deferred_classes if cls.is_registered
+    )
     errors = []
-    for cls in classes:
+    for cls in reversed(registered_classes):
         try:
             bpy.utils.unregister_class(cls)
         except RuntimeError:
-            errors.append(
-                traceback.format_exc() + f"\nbpy.utils.unregister_class({cls}):"
-            )
+            errors.append((cls, sys.exc_info()))
     if errors:
-        raise RuntimeError("\n".join(errors))
+        raise RuntimeError(
+            "\n".join(
+                "".join(traceback.format_exception(*exc_info))
+                + f"\nbpy.utils.unregister_class({cls}):"
+                for cls, exc_info in errors
+            )
+        )
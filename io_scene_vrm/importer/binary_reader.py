@@ -6,12 +6,21 @@ https://opensource.org/licenses/mit-license.php
 """
 
 import struct
-from typing import Union
+from typing import Tuple, Union
 
 from ..gl_constants import GlConstants
 
 
 class BinaryReader:
+    struct_format_chars = {
+        GlConstants.UNSIGNED_INT: "I",
+        GlConstants.INT: "i",
+        GlConstants.UNSIGNED_SHORT: "H",
+        GlConstants.SHORT: "h",
+        GlConstants.FLOAT: "f",
+        GlConstants.UNSIGNED_BYTE: "B",
+    }
+
     def __init__(self, data: bytes) -> None:
         self.data = data
         self.pos = 0
@@ -76,6 +85,18 @@ class BinaryReader:
         print("unsupported type : {}".format(data_type))
         raise Exception
 
+    def read_as_data_type_array(
+        self, data_type: int, count: int
+    ) -> Tuple[Union[int, float], ...]:
+        format_char = self.struct_format_chars.get(data_type)
+        if format_char is None:
+            print("unsupported type : {}".format(data_type))
+            raise Exception
+        data_struct = struct.Struct(f"<{count}{format_char}")
+        result = data_struct.unpack_from(self.data, self.pos)
+        self.pos += data_struct.size
+        return result
+
 
 if __name__ == "__main__":
     BinaryReader(b"Hello")
@@ -831,9 +831,7 @@ class BlendModel:
                                 ),
                             )
 
-                            normalized_joint_dic = {
-                                joint_id: 0 for joint_id in sorted_joint_ids
-                            }
+                            normalized_joint_dic = dict.fromkeys(sorted_joint_ids, 0)
 
                             for i, k in enumerate(joint_ids):
                                 normalized_joint_dic[k] += weights[i]
@@ -50,6 +50,8 @@ message={self.message}
 class LicenseConfirmationRequired(Exception):
     def __init__(self, props: List[LicenseConfirmationRequiredProp]):
         self.props = props
+        # The result of parse_glb() to resume read_vrm() after the confirmation
+        self.parsed_glb: Optional[Tuple[Any, bytes]] = None
         super().__init__(self.description())
 
     def description(self) -> str:
@@ -123,11 +125,14 @@ def read_vrm(
     make_new_texture_folder: bool,
     use_simple_principled_material: bool,
     license_check: bool,
+    parsed_glb: Optional[Tuple[Any, bytes]] = None,
 ) -> vrm_types.VrmPydata:
     vrm_pydata = vrm_types.VrmPydata(filepath=model_path)
-    # datachunkは普通一つしかない
-    with open(model_path, "rb") as f:
-        vrm_pydata.json, body_binary = parse_glb(f.read())
+    if parsed_glb is None:
+        # datachunkは普通一つしかない
+        with open(model_path, "rb") as f:
+            parsed_glb = parse_glb(f.read())
+    vrm_pydata.json, body_binary = parsed_glb
 
     # KHR_DRACO_MESH_COMPRESSION は対応してない場合落とさないといけないらしい。どのみち壊れたデータになるからね。
     if (
@@ -139,7 +144,11 @@ def read_vrm(
         )
 
     if license_check:
-        validate_license(vrm_pydata)
+        try:
+            validate_license(vrm_pydata)
+        except LicenseConfirmationRequired as e:
+            e.parsed_glb = parsed_glb
+            raise
 
     texture_rip(vrm_pydata, body_binary, make_new_texture_folder)
 
@@ -430,15 +439,15 @@ def decode_bin(json_data, binary):
     for accessor in accessors:
         type_num = type_num_dict[accessor["type"]]
         br.set_pos(buffer_views[accessor["bufferView"]]["byteOffset"])
-        data_list = []
-        for _ in range(accessor["count"]):
-            if type_num == 1:
-                data = br.read_as_data_type(accessor["componentType"])
-            else:
-                data = []
-                for _ in range(type_num):
-                    data.append(br.read_as_data_type(accessor["componentType"]))
-            data_list.append(data)
+        data = br.read_as_data_type_array(
+            accessor["componentType"], accessor["count"] * type_num
+        )
+        if type_num == 1:
+            data_list = list(data)
+        else:
+            data_list = [
+                list(data[i : i + type_num]) for i in range(0, len(data), type_num)
+            ]
         decoded_binary.append(data_list)
 
     return decoded_binary
@@ -18,11 +18,12 @@ class GlbBinCollection:
     def pack_all(self):
         bin_dic = OrderedDict()
         byte_offset = 0
+        bin_parts = [self.bin]
         bin_dic["bufferViews"] = []
         bin_dic["accessors"] = []
 
         for vab in self.vertex_attribute_bins:
-            self.bin += vab.bin
+            bin_parts.append(vab.bin)
             vab_dic = OrderedDict(
                 {
                     "bufferView": self.get_new_buffer_view_id(),
@@ -51,7 +52,7 @@ class GlbBinCollection:
         if len(self.image_bins) > 0:
             bin_dic["images"] = []
             for img in self.image_bins:
-                self.bin += img.bin
+                bin_parts.append(img.bin)
                 bin_dic["images"].append(
                     OrderedDict(
                         {
@@ -73,6 +74,7 @@ class GlbBinCollection:
                 byte_offset += img.bin_length
 
         bin_dic["buffers"] = [{"byteLength": byte_offset}]
+        self.bin = b"".join(bin_parts)
 
         buffer_view_and_accessors_ordered_dic = bin_dic
         return buffer_view_and_accessors_ordered_dic, self.bin
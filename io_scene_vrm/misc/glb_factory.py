@@ -4,16 +4,19 @@ Released under the MIT license
 https://opensource.org/licenses/mit-license.php
 
 """
+import heapq
 import json
 import os
+import pathlib
 import struct
-from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from math import floor
 from sys import float_info
-from typing import Any, Dict
+from typing import Any, Dict, List, Tuple
 
 import bmesh
 import bpy
+import numpy
 
 from .. import vrm_types
 from ..gl_constants import GlConstants
@@ -21,6 +24,18 @@ from .glb_bin_collection import GlbBin, GlbBinCollection, ImageBin
 from .version import version
 from .vrm_helper import find_export_objects, shader_nodes_and_materials
 
+mtoon_float_props = tuple(
+    (k, v)
+    for k, v in vrm_types.MaterialMtoon.float_props_exchange_dic.items()
+    if v is not None
+)
+# The texture sockets are exported as textureProperties instead
+mtoon_vector_props = tuple(
+    (k, v)
+    for k, v in vrm_types.MaterialMtoon.vector_props_exchange_dic.items()
+    if v not in vrm_types.MaterialMtoon.texture_kind_exchange_dic.values()
+)
+
 
 class GlbObj:
     class ValidationError(Exception):
@@ -36,7 +51,7 @@ class GlbObj:
             export_invisibles, export_only_selections
         )
         self.vrm_version = None
-        self.json_dic: Dict[str, Any] = OrderedDict()
+        self.json_dic: Dict[str, Any] = {}
         self.bin = b""
         self.glb_bin_collector = GlbBinCollection()
         self.armature = [obj for obj in self.export_objects if obj.type == "ARMATURE"][
@@ -45,6 +60,10 @@ class GlbObj:
         self.result = None
 
     def convert_bpy2glb(self, vrm_version):
+        self.result = b"".join(self.convert_bpy2glb_chunks(vrm_version))
+        return self.result
+
+    def convert_bpy2glb_chunks(self, vrm_version) -> List[bytes]:
         self.vrm_version = vrm_version
         self.image_to_bin()
         self.armature_to_node_and_scenes_dic()
@@ -53,25 +72,34 @@ class GlbObj:
         self.json_dic["scene"] = 0
         self.gltf_meta_to_dic()
         self.vrm_meta_to_dic()  # colliderとかmetaとか....
-        self.finalize()
-        return self.result
+        return self.finalize()
 
     @staticmethod
     def axis_blender_to_glb(vec3):
         return [vec3[i] * t for i, t in zip([0, 2, 1], [-1, 1, 1])]
 
+    @staticmethod
+    def axis_blender_to_glb_batch(vectors: numpy.ndarray) -> numpy.ndarray:
+        return vectors[:, [0, 2, 1]] * numpy.array([-1, 1, 1], dtype=vectors.dtype)
+
     @staticmethod
     def textblock2str(textblock):
         return "".join([line.body for line in textblock.lines])
 
+    def armature_textblock_json(self, key: str) -> Any:
+        return json.loads(self.textblock2str(bpy.data.texts[self.armature[key]]))
+
     def image_to_bin(self):
-        # collect used image
-        used_images = []
-        used_materials = []
-        for mesh in [obj for obj in self.export_objects if obj.type == "MESH"]:
-            for mat in mesh.data.materials:
-                if mat not in used_materials:
-                    used_materials.append(mat)
+        # collect used image. A dict is used as an insertion ordered set
+        used_images: Dict[bpy.types.Image, None] = {}
+        used_materials = list(
+            dict.fromkeys(
+                mat
+                for obj in self.export_objects
+                if obj.type == "MESH"
+                for mat in obj.data.materials
+            )
+        )
 
         # image fetching
         for node, mat in shader_nodes_and_materials(used_materials):
@@ -85,49 +113,60 @@ class GlbObj:
                     if shader_vals == "ReceiveShadow_Texture":
                         if node.inputs[shader_vals + "_alpha"].links:
                             n = node.inputs[shader_vals + "_alpha"].links[0].from_node
-                            if n.image not in used_images:
-                                used_images.append(n.image)
+                            used_images[n.image] = None
                     elif node.inputs[shader_vals].links:
                         n = node.inputs[shader_vals].links[0].from_node
-                        if n.image not in used_images:
-                            used_images.append(n.image)
+                        used_images[n.image] = None
             elif node.node_tree["SHADER"] == "GLTF":
                 mat["vrm_shader"] = "GLTF"
                 for k in vrm_types.Gltf.TEXTURE_INPUT_NAMES:
                     if node.inputs[k].links:
                         n = node.inputs[k].links[0].from_node
-                        if n.image not in used_images:
-                            used_images.append(n.image)
+                        used_images[n.image] = None
 
             elif node.node_tree["SHADER"] == "TRANSPARENT_ZWRITE":
                 mat["vrm_shader"] = "TRANSPARENT_ZWRITE"
                 if node.inputs["Main_Texture"].links:
                     n = node.inputs["Main_Texture"].links[0].from_node
-                    if n.image not in used_images:
-                        used_images.append(n.image)
+                    used_images[n.image] = None
             else:
                 # ?
                 pass
         # thumbnail
         if self.armature.get("texture") is not None:
             image = bpy.data.images[self.armature["texture"]]
-            if image not in used_images:
-                used_images.append(image)
+            used_images[image] = None
 
-        for image in sorted(
+        # Same order as bpy.data.images. The others follow in the order of use
+        image_indices = {image: i for i, image in enumerate(bpy.data.images)}
+        sorted_images = sorted(
             used_images,
-            key=lambda used_image: bpy.data.images.index(used_image)
-            if used_image in bpy.data.images.items()
-            else len(bpy.data.images) + used_images.index(used_image),
-        ):
-            with open(image.filepath_from_user(), "rb") as f:
-                image_bin = f.read()
-            name = image.name
-            filetype = "image/" + image.file_format.lower()
+            key=lambda used_image: image_indices.get(used_image, len(image_indices)),
+        )
+        # (name, path, mime type) read from Blender on the main thread
+        image_metas = [
+            (
+                image.name,
+                pathlib.Path(image.filepath_from_user()),
+                "image/" + image.file_format.lower(),
+            )
+            for image in sorted_images
+        ]
+        image_bins = []
+        if image_metas:
+            # File reads release the GIL
+            with ThreadPoolExecutor(max_workers=min(8, len(image_metas))) as executor:
+                image_bins = list(
+                    executor.map(
+                        pathlib.Path.read_bytes, [path for _, path, _ in image_metas]
+                    )
+                )
+        for (name, _, filetype), image_bin in zip(image_metas, image_bins):
             ImageBin(image_bin, name, filetype, self.glb_bin_collector)
 
     def armature_to_node_and_scenes_dic(self):
-        nodes = []
+        # Indexed by bone id
+        nodes = [None] * len(self.armature.data.bones)
         scene = []
         skins = []
 
@@ -135,34 +174,41 @@ class GlbObj:
             b.name: bone_id for bone_id, b in enumerate(self.armature.data.bones)
         }
 
+        head_locals = numpy.empty(len(self.armature.data.bones) * 3, dtype="<f4")
+        self.armature.data.bones.foreach_get("head_local", head_locals)
+        # Blender stores float32 values and they are widened exactly
+        head_locals = head_locals.astype(numpy.float64).reshape(-1, 3)
+        parent_head_locals = numpy.array(
+            [
+                head_locals[bone_id_dic[b.parent.name]]
+                if b.parent is not None
+                else [0, 0, 0]
+                for b in self.armature.data.bones
+            ],
+            dtype=numpy.float64,
+        ).reshape(-1, 3)
+        translations = self.axis_blender_to_glb_batch(
+            head_locals - parent_head_locals
+        ).tolist()
+
         def bone_to_node(b_bone):
-            parent_head_local = (
-                b_bone.parent.head_local if b_bone.parent is not None else [0, 0, 0]
-            )
-            node = OrderedDict(
-                {
-                    "name": b_bone.name,
-                    "translation": self.axis_blender_to_glb(
-                        [b_bone.head_local[i] - parent_head_local[i] for i in range(3)]
-                    ),
-                    # "rotation":[0,0,0,1],
-                    # "scale":[1,1,1],
-                    "children": [bone_id_dic[ch.name] for ch in b_bone.children],
-                }
-            )
+            node = {
+                "name": b_bone.name,
+                "translation": translations[bone_id_dic[b_bone.name]],
+                # "rotation":[0,0,0,1],
+                # "scale":[1,1,1],
+                "children": [bone_id_dic[ch.name] for ch in b_bone.children],
+            }
             if len(node["children"]) == 0:
                 del node["children"]
             return node
 
-        human_bone_node_names = []
-        for human_bone in vrm_types.HumanBones.requires + vrm_types.HumanBones.defines:
-            if (
-                human_bone in self.armature.data.keys()
-                and self.armature.data[human_bone]
-                and self.armature.data[human_bone]
-                in [bone.name for bone in self.armature.data.bones]
-            ):
-                human_bone_node_names.append(self.armature.data[human_bone])
+        bone_names = set(bone_id_dic)
+        human_bone_node_names = set()
+        for human_bone in vrm_types.HumanBones.all_bones:
+            bone_name = self.armature.data.get(human_bone)
+            if bone_name and bone_name in bone_names:
+                human_bone_node_names.add(bone_name)
 
         for bone in self.armature.data.bones:
             if bone.parent is not None:
@@ -176,46 +222,28 @@ class GlbObj:
             skin["joints"].append(root_bone_id)
             skin["skeleton"] = root_bone_id
             scene.append(root_bone_id)
-            nodes.append(bone_to_node(bone))
+            nodes[root_bone_id] = bone_to_node(bone)
             bone_children = list(bone.children)
             while bone_children:
                 child = bone_children.pop()
                 if child.name in human_bone_node_names:
                     has_human_bone = True
-                nodes.append(bone_to_node(child))
-                skin["joints"].append(bone_id_dic[child.name])
-                bone_children += list(child.children)
-            nodes = sorted(nodes, key=lambda node: bone_id_dic[node["name"]])
+                child_bone_id = bone_id_dic[child.name]
+                nodes[child_bone_id] = bone_to_node(child)
+                skin["joints"].append(child_bone_id)
+                bone_children.extend(child.children)
             if has_human_bone:
                 skins.append(skin)
 
         for skin in skins:
-            skin_invert_matrix_bin = b""
-            f_4x4_packer = struct.Struct("<16f").pack
-            for node_id in skin["joints"]:
-                bone_name = nodes[node_id]["name"]
-                bone_glb_world_pos = self.axis_blender_to_glb(
-                    self.armature.data.bones[bone_name].head_local
-                )
-                inv_matrix = [
-                    1,
-                    0,
-                    0,
-                    0,
-                    0,
-                    1,
-                    0,
-                    0,
-                    0,
-                    0,
-                    1,
-                    0,
-                    -bone_glb_world_pos[0],
-                    -bone_glb_world_pos[1],
-                    -bone_glb_world_pos[2],
-                    1,
-                ]
-                skin_invert_matrix_bin += f_4x4_packer(*inv_matrix)
+            # Node ids are bone ids
+            bone_glb_world_positions = self.axis_blender_to_glb_batch(
+                head_locals[skin["joints"]].astype("<f4")
+            )
+            inv_matrices = numpy.zeros((len(skin["joints"]), 16), dtype="<f4")
+            inv_matrices[:, [0, 5, 10, 15]] = 1
+            inv_matrices[:, 12:15] = -bone_glb_world_positions
+            skin_invert_matrix_bin = inv_matrices.tobytes()
 
             im_bin = GlbBin(
                 skin_invert_matrix_bin,
@@ -238,54 +266,35 @@ class GlbObj:
         image_id_dic = {
             image.name: image.image_id for image in self.glb_bin_collector.image_bins
         }
-        sampler_dic = OrderedDict()
-        texture_dic = OrderedDict()
-        sampler_count = 0
-        texture_count = 0
+        sampler_dic: Dict[Tuple[int, int], int] = {}
+        texture_dic: Dict[Tuple[int, int], int] = {}
 
         # region texture func
 
         def add_texture(image_name, wrap_type, filter_type):
-            nonlocal sampler_count
-            nonlocal texture_count
-            if (wrap_type, filter_type) not in sampler_dic.keys():
-                sampler_dic.update({(wrap_type, filter_type): sampler_count})
-                sampler_count += 1
-            if (
-                image_id_dic[image_name],
-                sampler_dic[(wrap_type, filter_type)],
-            ) not in texture_dic.keys():
-                texture_dic.update(
-                    {
-                        (
-                            image_id_dic[image_name],
-                            sampler_dic[(wrap_type, filter_type)],
-                        ): texture_count
-                    }
-                )
-                texture_count += 1
-            return texture_dic[
-                (image_id_dic[image_name], sampler_dic[(wrap_type, filter_type)])
-            ]
+            sampler_id = sampler_dic.setdefault(
+                (wrap_type, filter_type), len(sampler_dic)
+            )
+            return texture_dic.setdefault(
+                (image_id_dic[image_name], sampler_id), len(texture_dic)
+            )
 
         def apply_texture_and_sampler_to_dic():
-            if sampler_count > 0:
-                sampler_list = self.json_dic["samplers"] = []
-                for sampler in sampler_dic.keys():
-                    sampler_list.append(
-                        {
-                            "magFilter": sampler[1],
-                            "minFilter": sampler[1],
-                            "wrapS": sampler[0],
-                            "wrapT": sampler[0],
-                        }
-                    )
-            if texture_count > 0:
-                textures = []
-                for tex in texture_dic:
-                    texture = {"sampler": tex[1], "source": tex[0]}
-                    textures.append(texture)
-                self.json_dic.update({"textures": textures})
+            if sampler_dic:
+                self.json_dic["samplers"] = [
+                    {
+                        "magFilter": filter_type,
+                        "minFilter": filter_type,
+                        "wrapS": wrap_type,
+                        "wrapT": wrap_type,
+                    }
+                    for wrap_type, filter_type in sampler_dic
+                ]
+            if texture_dic:
+                self.json_dic["textures"] = [
+                    {"sampler": sampler_id, "source": image_id}
+                    for image_id, sampler_id in texture_dic
+                ]
 
         # region function separate by shader
         def pbr_fallback(
@@ -344,32 +353,17 @@ class GlbObj:
             tex_name = None
             wrap_type = None
             filter_type = None
-            if (
-                shader_node.inputs.get(input_socket_name)
-                and shader_node.inputs.get(input_socket_name).links
-            ):
-                tex_name = (
-                    shader_node.inputs.get(input_socket_name)
-                    .links[0]
-                    .from_node.image.name
-                )
+            socket = shader_node.inputs.get(input_socket_name)
+            if socket and socket.links:
+                image_node = socket.links[0].from_node
+                tex_name = image_node.image.name
                 # blender is ('Linear', 'Closest', 'Cubic', 'Smart') glTF is Linear, Closest
-                if (
-                    shader_node.inputs.get(input_socket_name)
-                    .links[0]
-                    .from_node.interpolation
-                    == "Closest"
-                ):
+                if image_node.interpolation == "Closest":
                     filter_type = GlConstants.NEAREST
                 else:
                     filter_type = GlConstants.LINEAR
                 # blender is ('REPEAT', 'EXTEND', 'CLIP') glTF is CLAMP_TO_EDGE,MIRRORED_REPEAT,REPEAT
-                if (
-                    shader_node.inputs.get(input_socket_name)
-                    .links[0]
-                    .from_node.extension
-                    == "REPEAT"
-                ):
+                if image_node.extension == "REPEAT":
                     wrap_type = GlConstants.REPEAT
                 else:
                     wrap_type = GlConstants.CLAMP_TO_EDGE
@@ -377,55 +371,40 @@ class GlbObj:
 
         def get_float_value(shader_node, input_socket_name):
             float_val = None
-            if shader_node.inputs.get(input_socket_name):
-                if shader_node.inputs.get(input_socket_name).links:
-                    float_val = (
-                        shader_node.inputs.get(input_socket_name)
-                        .links[0]
-                        .from_node.outputs[0]
-                        .default_value
-                    )
+            socket = shader_node.inputs.get(input_socket_name)
+            if socket:
+                if socket.links:
+                    float_val = socket.links[0].from_node.outputs[0].default_value
                 else:
-                    float_val = shader_node.inputs.get(input_socket_name).default_value
+                    float_val = socket.default_value
             return float_val
 
         def get_rgba_val(shader_node, input_socket_name):
             rgba_val = None
-            if shader_node.inputs.get(input_socket_name):
-                if shader_node.inputs.get(input_socket_name).links:
-                    rgba_val = [
-                        shader_node.inputs.get(input_socket_name)
-                        .links[0]
-                        .from_node.outputs[0]
-                        .default_value[i]
-                        for i in range(4)
-                    ]
+            socket = shader_node.inputs.get(input_socket_name)
+            if socket:
+                if socket.links:
+                    default_value = socket.links[0].from_node.outputs[0].default_value
                 else:
-                    rgba_val = [
-                        shader_node.inputs.get(input_socket_name).default_value[i]
-                        for i in range(4)
-                    ]
+                    default_value = socket.default_value
+                rgba_val = list(default_value[:4])
             return rgba_val
 
         # endregion util func
 
         def make_mtoon_unversioned_extension_dic(b_mat, mtoon_shader_node):
-            mtoon_dic = OrderedDict()
+            mtoon_dic = {}
             mtoon_dic["name"] = b_mat.name
             mtoon_dic["shader"] = "VRM/MToon"
             mtoon_dic["keywordMap"] = keyword_map = {}
             mtoon_dic["tagMap"] = tag_map = {}
-            mtoon_float_dic = mtoon_dic["floatProperties"] = OrderedDict()
-            mtoon_vector_dic = mtoon_dic["vectorProperties"] = OrderedDict()
-            mtoon_texture_dic = mtoon_dic["textureProperties"] = OrderedDict()
+            mtoon_float_dic = mtoon_dic["floatProperties"] = {}
+            mtoon_vector_dic = mtoon_dic["vectorProperties"] = {}
+            mtoon_texture_dic = mtoon_dic["textureProperties"] = {}
 
             outline_width_mode = 0
             outline_color_mode = 0
-            for float_key, float_prop in [
-                (k, val)
-                for k, val in vrm_types.MaterialMtoon.float_props_exchange_dic.items()
-                if val is not None
-            ]:
+            for float_key, float_prop in mtoon_float_props:
                 float_val = get_float_value(mtoon_shader_node, float_prop)
                 if float_val is not None:
                     mtoon_float_dic[float_key] = float_val
@@ -462,22 +441,7 @@ class GlbObj:
                 else:
                     outline_keyword_set(False, True, False, True)
 
-            vec_props = list(
-                dict.fromkeys(
-                    vrm_types.MaterialMtoon.vector_props_exchange_dic.values()
-                )
-            )
-            for (
-                remove_vec_prop
-            ) in vrm_types.MaterialMtoon.texture_kind_exchange_dic.values():
-                if remove_vec_prop in vec_props:
-                    vec_props.remove(remove_vec_prop)
-
-            for vector_key, vector_prop in [
-                (k, v)
-                for k, v in vrm_types.MaterialMtoon.vector_props_exchange_dic.items()
-                if v in vec_props
-            ]:
+            for vector_key, vector_prop in mtoon_vector_props:
                 vector_val = get_rgba_val(mtoon_shader_node, vector_prop)
                 if vector_val is not None:
                     mtoon_vector_dic[vector_key] = vector_val
@@ -507,7 +471,7 @@ class GlbObj:
                             uv_offset_scaling_node = None
                         if (
                             uv_offset_scaling_node is not None
-                            and uv_offset_scaling_node.type == "MAPPING'"
+                            and uv_offset_scaling_node.type == "MAPPING"
                         ):
                             if bpy.app.version[1] == 80:
                                 mtoon_vector_dic[texture_key] = [
@@ -517,19 +481,17 @@ class GlbObj:
                                     uv_offset_scaling_node.scale[1],
                                 ]
                             else:
+                                location = uv_offset_scaling_node.inputs[
+                                    "Location"
+                                ].default_value
+                                scale = uv_offset_scaling_node.inputs[
+                                    "Scale"
+                                ].default_value
                                 mtoon_vector_dic[texture_key] = [
-                                    uv_offset_scaling_node.inputs[
-                                        "Location"
-                                    ].default_value[0],
-                                    uv_offset_scaling_node.inputs[
-                                        "Location"
-                                    ].default_value[1],
-                                    uv_offset_scaling_node.inputs[
-                                        "Scale"
-                                    ].default_value[0],
-                                    uv_offset_scaling_node.inputs[
-                                        "Scale"
-                                    ].default_value[1],
+                                    location[0],
+                                    location[1],
+                                    scale[0],
+                                    scale[1],
                                 ]
                         else:
                             mtoon_vector_dic[texture_key] = [0, 0, 1, 1]
@@ -701,18 +663,13 @@ class GlbObj:
                 mt_prop["uvAnimationRotationSpeedFactor"] = mtoon_float_dic.get(
                     "_UvAnimRotation"
                 )
-                garbage_list = []
-                for k, v in mt_prop.items():
-                    if v is None:
-                        garbage_list.append(k)
-                for garbage in garbage_list:
-                    mt_prop.pop(garbage)
+                mt_prop = {k: v for k, v in mt_prop.items() if v is not None}
 
                 pbr_dic["extensions"].update({"VRMC_materials_mtoon": mtoon_ext_dic})
             return mtoon_dic, pbr_dic
 
         def make_gltf_mat_dic(b_mat, gltf_shader_node):
-            gltf_dic = OrderedDict()
+            gltf_dic = {}
             gltf_dic["name"] = b_mat.name
             gltf_dic["shader"] = "VRM_USE_GLTFSHADER"
             gltf_dic["keywordMap"] = {}
@@ -765,7 +722,7 @@ class GlbObj:
             return gltf_dic, pbr_dic
 
         def make_transzw_mat_dic(b_mat, transzw_shader_node):
-            zw_dic = OrderedDict()
+            zw_dic = {}
             zw_dic["name"] = b_mat.name
             zw_dic["shader"] = "VRM/UnlitTransparentZWrite"
             zw_dic["renderQueue"] = 2600
@@ -788,36 +745,35 @@ class GlbObj:
 
         # endregion function separate by shader
 
-        used_materials = []
-        for mesh in [obj for obj in self.export_objects if obj.type == "MESH"]:
-            for mat in mesh.data.materials:
-                if mat not in used_materials:
-                    used_materials.append(mat)
+        used_materials = list(
+            dict.fromkeys(
+                mat
+                for obj in self.export_objects
+                if obj.type == "MESH"
+                for mat in obj.data.materials
+            )
+        )
+
+        def get_surface_shader_node(b_mat):
+            for node in b_mat.node_tree.nodes:
+                if node.type == "OUTPUT_MATERIAL":
+                    return node.inputs["Surface"].links[0].from_node
+            message = f'Material "{b_mat.name}" has no material output node.'
+            print(message)
+            raise Exception(message)
 
         for b_mat in used_materials:
             if b_mat["vrm_shader"] == "MToon_unversioned":
-                for node in b_mat.node_tree.nodes:
-                    if node.type == "OUTPUT_MATERIAL":
-                        mtoon_shader_node = node.inputs["Surface"].links[0].from_node
-                        break
                 material_properties_dic, pbr_dic = make_mtoon_unversioned_extension_dic(
-                    b_mat, mtoon_shader_node
+                    b_mat, get_surface_shader_node(b_mat)
                 )
             elif b_mat["vrm_shader"] == "GLTF":
-                for node in b_mat.node_tree.nodes:
-                    if node.type == "OUTPUT_MATERIAL":
-                        gltf_shader_node = node.inputs["Surface"].links[0].from_node
-                        break
                 material_properties_dic, pbr_dic = make_gltf_mat_dic(
-                    b_mat, gltf_shader_node
+                    b_mat, get_surface_shader_node(b_mat)
                 )
             elif b_mat["vrm_shader"] == "TRANSPARENT_ZWRITE":
-                for node in b_mat.node_tree.nodes:
-                    if node.type == "OUTPUT_MATERIAL":
-                        zw_shader_node = node.inputs["Surface"].links[0].from_node
-                        break
                 material_properties_dic, pbr_dic = make_transzw_mat_dic(
-                    b_mat, zw_shader_node
+                    b_mat, get_surface_shader_node(b_mat)
                 )
             else:
                 message = "VRM doesn't support \"" + b_mat["vrm_shader"] + '" shader.'
@@ -844,24 +800,33 @@ class GlbObj:
 
     @staticmethod
     def fetch_morph_vertex_normal_difference(mesh_data):
-        morph_normal_diff_dic = {}
-        vert_base_normal_dic = OrderedDict()
-        for kb in mesh_data.shape_keys.key_blocks:
-            vert_base_normal_dic.update({kb.name: kb.normals_vertex_get()})
-        reference_key_name = mesh_data.shape_keys.reference_key.name
-        for k, v in vert_base_normal_dic.items():
-            if k == reference_key_name:
-                continue
-            values = []
-            for vert_morph_normal, vert_base_normal in zip(
-                zip(*[iter(v)] * 3),
-                zip(*[iter(vert_base_normal_dic[reference_key_name])] * 3),
-            ):
-                values.append(
-                    [vert_morph_normal[i] - vert_base_normal[i] for i in range(3)]
-                )
-            morph_normal_diff_dic.update({k: values})
-        return morph_normal_diff_dic
+        reference_key = mesh_data.shape_keys.reference_key
+        reference_normals = numpy.array(
+            reference_key.normals_vertex_get(), dtype=numpy.float64
+        ).reshape(-1, 3)
+        return {
+            kb.name: numpy.array(kb.normals_vertex_get(), dtype=numpy.float64).reshape(
+                -1, 3
+            )
+            - reference_normals
+            for kb in mesh_data.shape_keys.key_blocks
+            if kb.name != reference_key.name
+        }
+
+    @staticmethod
+    def vec3_min_max(vectors: numpy.ndarray) -> List[List[float]]:
+        # Same as comparing one by one: NaN is ignored and the first one wins a tie
+        fmin, fmax = -float_info.max, float_info.max  # .minはfloatで一番細かい正の数を示す。
+        minmax = [[fmax, fmax, fmax], [fmin, fmin, fmin]]
+        for i in range(3):
+            values = vectors[:, i]
+            lower_values = values[values < fmax]
+            if lower_values.size:
+                minmax[0][i] = lower_values[lower_values.argmin()].item()
+            higher_values = values[values > fmin]
+            if higher_values.size:
+                minmax[1][i] = higher_values[higher_values.argmax()].item()
+        return minmax
 
     def mesh_to_bin_and_dic(self):
         self.json_dic["meshes"] = []
@@ -876,15 +841,13 @@ class GlbObj:
                 and mesh.parent_bone is not None
             ):
                 is_skin_mesh = False
-            node_dic = OrderedDict(
-                {
-                    "name": mesh.name,
-                    "translation": self.axis_blender_to_glb(mesh.location),
-                    "rotation": [0, 0, 0, 1],  # このへんは規約なので
-                    "scale": [1, 1, 1],  # このへんは規約なので
-                    "mesh": mesh_id,
-                }
-            )
+            node_dic = {
+                "name": mesh.name,
+                "translation": self.axis_blender_to_glb(mesh.location),
+                "rotation": [0, 0, 0, 1],  # このへんは規約なので
+                "scale": [1, 1, 1],  # このへんは規約なので
+                "mesh": mesh_id,
+            }
             if is_skin_mesh:
                 node_dic["translation"] = [0, 0, 0]  # skinnedmeshはtransformを無視される
                 # TODO: 決め打ちってどうよ:一体のモデルなのだから2つもあっては困る(から決め打ち(やめろ(やだ))
@@ -957,7 +920,9 @@ class GlbObj:
             if not is_skin_mesh:
                 # TODO:
                 bmesh.ops.translate(bm_temp, vec=-mesh.location)
-            bmesh.ops.triangulate(bm_temp, faces=bm_temp.faces[:])
+            # Every polygon has at least 3 loops, so this means all are triangles
+            if len(mesh_data.loops) != 3 * len(mesh_data.polygons):
+                bmesh.ops.triangulate(bm_temp, faces=bm_temp.faces)
             bm_temp.to_mesh(mesh_data)
             bm_temp.free()
 
@@ -965,220 +930,233 @@ class GlbObj:
                 mesh_data.calc_loop_triangles()
                 mesh_data.calc_normals_split()
 
-            bm = bmesh.new()
-            bm.from_mesh(mesh_data)
-
             # region temporary used
             mat_id_dic = {
                 mat["name"]: i for i, mat in enumerate(self.json_dic["materials"])
             }
-            material_slot_dic = {
-                i: mat.name for i, mat in enumerate(mesh.material_slots)
-            }
+            # Indexed by material_index
+            slot_mat_ids = numpy.array(
+                [mat_id_dic[mat.name] for mat in mesh.material_slots], dtype=numpy.int64
+            )
             node_id_dic = {
                 node["name"]: i for i, node in enumerate(self.json_dic["nodes"])
             }
 
-            v_group_name_dic = {i: vg.name for i, vg in enumerate(mesh.vertex_groups)}
-            fmin, fmax = -float_info.max, float_info.max  # .minはfloatで一番細かい正の数を示す。
-            unique_vertex_id = 0
-            # {(uv...,vertex_index):unique_vertex_id} (uvと頂点番号が同じ頂点は同じものとして省くようにする)
-            unique_vertex_dic = {}
+            # Indexed by vertex group index
+            vertex_group_joint_ids = (
+                [
+                    self.joint_id_from_node_name_solver(vg.name, node_id_dic)
+                    for vg in mesh.vertex_groups
+                ]
+                if is_skin_mesh
+                else []
+            )
             uvlayers_dic = {
                 i: uvlayer.name for i, uvlayer in enumerate(mesh_data.uv_layers)
             }
 
             # endregion  temporary_used
-            primitive_index_bin_dic = OrderedDict(
-                {mat_id_dic[mat.name]: b"" for mat in mesh.material_slots}
-            )
-            primitive_index_vertex_count = OrderedDict(
-                {mat_id_dic[mat.name]: 0 for mat in mesh.material_slots}
+
+            # region bulk fetch
+            vertex_count = len(mesh_data.vertices)
+            loop_count = len(mesh_data.loops)
+            polygon_count = len(mesh_data.polygons)
+            vertex_cos = numpy.empty(vertex_count * 3, dtype=numpy.float32)
+            mesh_data.vertices.foreach_get("co", vertex_cos)
+            vertex_cos = vertex_cos.reshape(-1, 3)
+            loop_vertex_indices = numpy.empty(loop_count, dtype=numpy.int32)
+            mesh_data.loops.foreach_get("vertex_index", loop_vertex_indices)
+            polygon_loop_totals = numpy.empty(polygon_count, dtype=numpy.int32)
+            mesh_data.polygons.foreach_get("loop_total", polygon_loop_totals)
+            # Loops are stored in polygon order
+            loop_polygon_indices = numpy.repeat(
+                numpy.arange(polygon_count), polygon_loop_totals
             )
+            polygon_material_indices = numpy.empty(polygon_count, dtype=numpy.int32)
+            mesh_data.polygons.foreach_get("material_index", polygon_material_indices)
+            loop_uvs = []
+            for uvlayer_name in uvlayers_dic.values():
+                uvs = numpy.empty(loop_count * 2, dtype=numpy.float32)
+                mesh_data.uv_layers[uvlayer_name].data.foreach_get("uv", uvs)
+                loop_uvs.append(uvs.reshape(-1, 2))
+
+            if mesh_data.has_custom_normals:
+                loop_triangle_count = len(mesh_data.loop_triangles)
+                loop_triangle_loops = numpy.empty(
+                    loop_triangle_count * 3, dtype=numpy.int32
+                )
+                mesh_data.loop_triangles.foreach_get("loops", loop_triangle_loops)
+                split_normals = numpy.empty(
+                    loop_triangle_count * 9, dtype=numpy.float32
+                )
+                mesh_data.loop_triangles.foreach_get("split_normals", split_normals)
+                loop_normals = numpy.empty((loop_count, 3), dtype=numpy.float32)
+                loop_normals[loop_triangle_loops] = split_normals.reshape(-1, 3)
+            else:
+                vertex_normals = numpy.empty(vertex_count * 3, dtype=numpy.float32)
+                mesh_data.vertices.foreach_get("normal", vertex_normals)
+                polygon_normals = numpy.empty(polygon_count * 3, dtype=numpy.float32)
+                mesh_data.polygons.foreach_get("normal", polygon_normals)
+                polygon_use_smooths = numpy.empty(polygon_count, dtype=bool)
+                mesh_data.polygons.foreach_get("use_smooth", polygon_use_smooths)
+                loop_normals = numpy.where(
+                    polygon_use_smooths[loop_polygon_indices, numpy.newaxis],
+                    vertex_normals.reshape(-1, 3)[loop_vertex_indices],
+                    polygon_normals.reshape(-1, 3)[loop_polygon_indices],
+                )
+            # endregion bulk fetch
+
+            primitive_mat_ids = [mat_id_dic[mat.name] for mat in mesh.material_slots]
+            primitive_index_bin_dic = dict.fromkeys(primitive_mat_ids, b"")
+            primitive_index_vertex_count = dict.fromkeys(primitive_mat_ids, 0)
             if mesh_data.shape_keys is None:
-                shape_pos_bin_dic = {}
-                shape_normal_bin_dic = {}
-                shape_min_max_dic = {}
                 morph_normal_diff_dic = {}
+                shape_cos_dic = {}
             else:
                 # 0番目Basisは省く
-                shape_pos_bin_dic = OrderedDict(
-                    {shape.name: b"" for shape in mesh_data.shape_keys.key_blocks[1:]}
-                )
-                shape_normal_bin_dic = OrderedDict(
-                    {shape.name: b"" for shape in mesh_data.shape_keys.key_blocks[1:]}
-                )
-                shape_min_max_dic = OrderedDict(
-                    {
-                        shape.name: [[fmax, fmax, fmax], [fmin, fmin, fmin]]
-                        for shape in mesh_data.shape_keys.key_blocks[1:]
-                    }
-                )
                 morph_normal_diff_dic = (
                     self.fetch_morph_vertex_normal_difference(mesh_data)
                     if self.vrm_version.startswith("0.")
                     else {}
-                )  # {morphname:{vertexid:[diff_X,diff_y,diff_z]}}
-            position_bin = b""
-            position_min_max = [[fmax, fmax, fmax], [fmin, fmin, fmin]]
-            normal_bin = b""
-            joints_bin = b""
-            weights_bin = b""
-            texcoord_bins = {uvlayer_id: b"" for uvlayer_id in uvlayers_dic.keys()}
-            float_vec4_packer = struct.Struct("<ffff").pack
-            float_vec3_packer = struct.Struct("<fff").pack
-            float_pair_packer = struct.Struct("<ff").pack
-            unsigned_int_scalar_packer = struct.Struct("<I").pack
-            unsigned_short_vec4_packer = struct.Struct("<HHHH").pack
-
-            def min_max(minmax, position):
-                for i in range(3):
-                    minmax[0][i] = (
-                        position[i] if position[i] < minmax[0][i] else minmax[0][i]
-                    )
-                    minmax[1][i] = (
-                        position[i] if position[i] > minmax[1][i] else minmax[1][i]
-                    )
-
-            for face in bm.faces:
-                for loop in face.loops:
-                    uv_list = []
-                    for uvlayer_name in uvlayers_dic.values():
-                        uv_layer = bm.loops.layers.uv[uvlayer_name]
-                        uv_list += [loop[uv_layer].uv[0], loop[uv_layer].uv[1]]
-
-                    vert_normal = [0, 0, 0]
-                    if mesh_data.has_custom_normals:
-                        tri = mesh_data.loop_triangles[face.index]
-                        vid = -1
-                        for i, _vid in enumerate(tri.vertices):
-                            if _vid == loop.vert.index:
-                                vid = i
-                        if vid == -1:
-                            print("something wrong in custom normal export")
-                        vert_normal = tri.split_normals[vid]
-                    else:
-                        if face.smooth:
-                            vert_normal = loop.vert.normal
-                        else:
-                            vert_normal = face.normal
-
-                    vertex_key = (*uv_list, *vert_normal, loop.vert.index)
-                    cached_vert_id = unique_vertex_dic.get(
-                        vertex_key
-                    )  # keyがなければNoneを返す
-                    if cached_vert_id is not None:
-                        primitive_index_bin_dic[
-                            mat_id_dic[material_slot_dic[face.material_index]]
-                        ] += unsigned_int_scalar_packer(cached_vert_id)
-                        primitive_index_vertex_count[
-                            mat_id_dic[material_slot_dic[face.material_index]]
-                        ] += 1
-                        continue
-                    unique_vertex_dic[vertex_key] = unique_vertex_id
-                    for uvlayer_id, uvlayer_name in uvlayers_dic.items():
-                        uv_layer = bm.loops.layers.uv[uvlayer_name]
-                        uv = loop[uv_layer].uv
-                        texcoord_bins[uvlayer_id] += float_pair_packer(
-                            uv[0], 1 - uv[1]
-                        )  # blenderとglbのuvは上下逆
-                    for shape_name in shape_pos_bin_dic:
-                        shape_layer = bm.verts.layers.shape[shape_name]
-                        morph_pos = self.axis_blender_to_glb(
-                            [
-                                loop.vert[shape_layer][i] - loop.vert.co[i]
-                                for i in range(3)
-                            ]
-                        )
-                        shape_pos_bin_dic[shape_name] += float_vec3_packer(*morph_pos)
-                        if self.vrm_version.startswith("0."):
-                            shape_normal_bin_dic[shape_name] += float_vec3_packer(
-                                *self.axis_blender_to_glb(
-                                    morph_normal_diff_dic[shape_name][loop.vert.index]
-                                )
-                            )
-                        min_max(shape_min_max_dic[shape_name], morph_pos)
-                    if is_skin_mesh:
-                        weight_and_joint_list = []
-                        for v_group in mesh_data.vertices[loop.vert.index].groups:
-                            joint_id = self.joint_id_from_node_name_solver(
-                                v_group_name_dic[v_group.group], node_id_dic
-                            )
-                            # 存在しないボーンを指してる場合は-1を返されてるので、その場合は飛ばす
-                            if joint_id == -1:
-                                continue
-                            # ウエイトがゼロのジョイントの値は無視してゼロになるようにする
-                            # https://github.com/KhronosGroup/glTF/tree/f33f90ad9439a228bf90cde8319d851a52a3f470/specification/2.0#skinned-mesh-attributes
-                            if v_group.weight < float_info.epsilon:
-                                continue
+                )  # {morphname:ndarray[vertexid][diff_x,diff_y,diff_z]}
+                shape_cos_dic = {}
+                for shape in mesh_data.shape_keys.key_blocks[1:]:
+                    shape_cos = numpy.empty(vertex_count * 3, dtype=numpy.float32)
+                    shape.data.foreach_get("co", shape_cos)
+                    shape_cos_dic[shape.name] = shape_cos.reshape(-1, 3)
+
+            if loop_count == 0:
+                # numpy.unique(axis=0) of older numpy fails on an empty array
+                unique_loop_indices = numpy.empty(0, dtype=numpy.intp)
+                loop_unique_vertex_ids = numpy.empty(0, dtype=numpy.intp)
+            else:
+                # float64 holds the float32 values exactly, like Python floats
+                vertex_keys = numpy.hstack(
+                    [*loop_uvs, loop_normals, loop_vertex_indices[:, numpy.newaxis]]
+                ).astype(numpy.float64)
+                # The rows are compared as floats, so 0.0 equals -0.0 and NaN is unique
+                _, first_loop_indices, loop_unique_indices = numpy.unique(
+                    vertex_keys, axis=0, return_index=True, return_inverse=True
+                )
+                # Number the unique vertices in the order of their first loop
+                unique_order = numpy.argsort(first_loop_indices)
+                unique_loop_indices = first_loop_indices[unique_order]
+                unique_vertex_ids = numpy.empty_like(unique_order)
+                unique_vertex_ids[unique_order] = numpy.arange(len(unique_order))
+                loop_unique_vertex_ids = unique_vertex_ids[
+                    loop_unique_indices.reshape(-1)
+                ]
 
-                            weight_and_joint_list.append((v_group.weight, joint_id))
+            loop_mat_ids = slot_mat_ids[polygon_material_indices][loop_polygon_indices]
+            for mat_id in primitive_index_bin_dic:
+                mat_unique_vertex_ids = loop_unique_vertex_ids[loop_mat_ids == mat_id]
+                primitive_index_bin_dic[mat_id] = mat_unique_vertex_ids.astype(
+                    "<u4"
+                ).tobytes()
+                primitive_index_vertex_count[mat_id] = len(mat_unique_vertex_ids)
+            unique_vertex_id = len(unique_loop_indices)
+            unique_vertex_indices = loop_vertex_indices[unique_loop_indices]
 
-                        while len(weight_and_joint_list) < 4:
-                            weight_and_joint_list.append((0.0, 0))
+            unique_vertex_cos = vertex_cos[unique_vertex_indices].astype(numpy.float64)
 
+            if is_skin_mesh:
+                # Split vertices share the skin of their mesh vertex
+                vertex_joints = numpy.zeros((vertex_count, 4), dtype="<u2")
+                vertex_weights = numpy.zeros((vertex_count, 4), dtype="<f4")
+                hips_bone_index = node_id_dic[self.armature.data["hips"]]
+                for vertex_index in dict.fromkeys(unique_vertex_indices.tolist()):
+                    weight_and_joint_list = []
+                    for v_group in mesh_data.vertices[vertex_index].groups:
+                        joint_id = vertex_group_joint_ids[v_group.group]
+                        # 存在しないボーンを指してる場合は-1を返されてるので、その場合は飛ばす
+                        if joint_id == -1:
+                            continue
+                        # ウエイトがゼロのジョイントの値は無視してゼロになるようにする
+                        # https://github.com/KhronosGroup/glTF/tree/f33f90ad9439a228bf90cde8319d851a52a3f470/specification/2.0#skinned-mesh-attributes
+                        if v_group.weight < float_info.epsilon:
+                            continue
+
+                        weight_and_joint_list.append((v_group.weight, joint_id))
+
+                    while len(weight_and_joint_list) < 4:
+                        weight_and_joint_list.append((0.0, 0))
+
+                    if len(weight_and_joint_list) > 4:
+                        print(
+                            f"Joints on vertex id:{vertex_index} in: {mesh.name} are truncated"
+                        )
+                        weight_and_joint_list = heapq.nlargest(4, weight_and_joint_list)
+                    else:
                         weight_and_joint_list.sort(reverse=True)
 
-                        if len(weight_and_joint_list) > 4:
-                            print(
-                                f"Joints on vertex id:{loop.vert.index} in: {mesh.name} are truncated"
-                            )
-                            weight_and_joint_list = weight_and_joint_list[:4]
+                    weights = [weight for weight, _ in weight_and_joint_list]
+                    joints = [joint for _, joint in weight_and_joint_list]
 
-                        weights = [weight for weight, _ in weight_and_joint_list]
-                        joints = [joint for _, joint in weight_and_joint_list]
-
-                        if sum(weights) < float_info.epsilon:
-                            print(
-                                f"No weight on vertex id:{loop.vert.index} in: {mesh.name}"
-                            )
+                    if sum(weights) < float_info.epsilon:
+                        print(f"No weight on vertex id:{vertex_index} in: {mesh.name}")
 
-                            # Attach hips bone
-                            hips_bone_name = self.armature.data["hips"]
-                            hips_bone_index = next(
-                                index
-                                for index, node in enumerate(self.json_dic["nodes"])
-                                if node["name"] == hips_bone_name
-                            )
-                            weights = [1.0, 0, 0, 0]
-                            joints = [hips_bone_index, 0, 0, 0]
+                        # Attach hips bone
+                        weights = [1.0, 0, 0, 0]
+                        joints = [hips_bone_index, 0, 0, 0]
 
-                        weights = vrm_types.normalize_weights_compatible_with_gl_float(
-                            weights
-                        )
-                        joints_bin += unsigned_short_vec4_packer(*joints)
-                        weights_bin += float_vec4_packer(*weights)
-
-                    vert_location = self.axis_blender_to_glb(loop.vert.co)
-                    position_bin += float_vec3_packer(*vert_location)
-                    min_max(position_min_max, vert_location)
-                    normal_bin += float_vec3_packer(
-                        *self.axis_blender_to_glb(vert_normal)
+                    weights = vrm_types.normalize_weights_compatible_with_gl_float(
+                        weights
                     )
-                    primitive_index_bin_dic[
-                        mat_id_dic[material_slot_dic[face.material_index]]
-                    ] += unsigned_int_scalar_packer(unique_vertex_id)
-                    primitive_index_vertex_count[
-                        mat_id_dic[material_slot_dic[face.material_index]]
-                    ] += 1
-                    unique_vertex_id += 1  # noqa: SIM113
+                    vertex_joints[vertex_index] = joints
+                    vertex_weights[vertex_index] = weights
+
+                joints_bin = vertex_joints[unique_vertex_indices].tobytes()
+                weights_bin = vertex_weights[unique_vertex_indices].tobytes()
+
+            shape_normal_bin_dic = {
+                shape_name: self.axis_blender_to_glb_batch(
+                    morph_normal_diff_dic[shape_name][unique_vertex_indices]
+                )
+                .astype("<f4")
+                .tobytes()
+                for shape_name in shape_cos_dic
+                if self.vrm_version.startswith("0.")
+            }
+            shape_pos_bin_dic = {}
+            shape_min_max_dic = {}
+            for shape_name, shape_cos in shape_cos_dic.items():
+                shape_positions = self.axis_blender_to_glb_batch(
+                    shape_cos[unique_vertex_indices].astype(numpy.float64)
+                    - unique_vertex_cos
+                )
+                shape_pos_bin_dic[shape_name] = shape_positions.astype("<f4").tobytes()
+                shape_min_max_dic[shape_name] = self.vec3_min_max(shape_positions)
+
+            vert_locations = self.axis_blender_to_glb_batch(unique_vertex_cos)
+            position_bin = vert_locations.astype("<f4").tobytes()
+            position_min_max = self.vec3_min_max(vert_locations)
+            normal_bin = (
+                self.axis_blender_to_glb_batch(
+                    loop_normals[unique_loop_indices].astype(numpy.float64)
+                )
+                .astype("<f4")
+                .tobytes()
+            )
+            texcoord_bins = {}
+            for uvlayer_id, uvs in enumerate(loop_uvs):
+                uvs = uvs[unique_loop_indices].astype(numpy.float64)
+                uvs[:, 1] = 1 - uvs[:, 1]  # blenderとglbのuvは上下逆
+                texcoord_bins[uvlayer_id] = uvs.astype("<f4").tobytes()
 
             # DONE :index position, uv, normal, position morph,JOINT WEIGHT
             # TODO: morph_normal, v_color...?
-            primitive_glbs_dic = OrderedDict(
-                {
-                    mat_id: GlbBin(
-                        index_bin,
-                        "SCALAR",
-                        GlConstants.UNSIGNED_INT,
-                        primitive_index_vertex_count[mat_id],
-                        None,
-                        self.glb_bin_collector,
-                    )
-                    for mat_id, index_bin in primitive_index_bin_dic.items()
-                    if index_bin != b""
-                }
-            )
+            primitive_glbs_dic = {
+                mat_id: GlbBin(
+                    index_bin,
+                    "SCALAR",
+                    GlConstants.UNSIGNED_INT,
+                    primitive_index_vertex_count[mat_id],
+                    None,
+                    self.glb_bin_collector,
+                )
+                for mat_id, index_bin in primitive_index_bin_dic.items()
+                if index_bin != b""
+            }
             pos_glb = GlbBin(
                 position_bin,
                 "VEC3",
@@ -1258,7 +1236,7 @@ class GlbObj:
 
             primitive_list = []
             for primitive_id, index_glb in primitive_glbs_dic.items():
-                primitive = OrderedDict({"mode": 4})
+                primitive = {"mode": 4}
                 primitive["material"] = primitive_id
                 primitive["indices"] = index_glb.accessor_id
                 primitive["attributes"] = {
@@ -1299,9 +1277,8 @@ class GlbObj:
                     }
                 primitive_list.append(primitive)
             self.json_dic["meshes"].append(
-                OrderedDict({"name": mesh.name, "primitives": primitive_list})
+                {"name": mesh.name, "primitives": primitive_list}
             )
-            bm.free()
             # endregion hell
 
             bpy.ops.object.mode_set(mode="OBJECT")
@@ -1324,17 +1301,46 @@ class GlbObj:
 
         self.json_dic.update(gltf_meta_dic)
 
+    def vrm0_humanoid_dic(self, node_name_id_dic: Dict[str, int]) -> Dict[str, Any]:
+        vrm_humanoid_dic: Dict[str, Any] = {"humanBones": []}
+        for humanbone in vrm_types.HumanBones.all_bones:
+            node_name = self.armature.data.get(humanbone)
+            if node_name and node_name in node_name_id_dic:
+                vrm_humanoid_dic["humanBones"].append(
+                    {
+                        "bone": humanbone,
+                        "node": node_name_id_dic[node_name],
+                        # TODO min,max,center,axisLength : useDef(ry):Trueなら不要な気がするのでほっとく
+                        "useDefaultValues": True,
+                    }
+                )
+        vrm_humanoid_dic.update(self.armature_textblock_json("humanoid_params"))
+        return vrm_humanoid_dic
+
+    def vrm1_humanoid_dic(self, node_name_id_dic: Dict[str, int]) -> Dict[str, Any]:
+        human_bones_dic = {}
+        for humanbone in vrm_types.HumanBones.all_bones:
+            node_name = self.armature.data.get(humanbone)
+            if node_name and node_name in node_name_id_dic:
+                human_bones_dic[humanbone] = {"node": node_name_id_dic[node_name]}
+        return {"humanBones": human_bones_dic}
+
     def vrm_meta_to_dic(self):
         # materialProperties は material_to_dic()で処理する
+        is_vrm0 = self.vrm_version.startswith("0.")
+        is_vrm1 = self.vrm_version.startswith("1.")
+        nodes = self.json_dic["nodes"]
+        meshes = self.json_dic["meshes"]
+        materials = self.json_dic["materials"]
         # region vrm_extension
-        vrm_extension_dic = OrderedDict()
-        if self.vrm_version.startswith("0."):
+        vrm_extension_dic = {}
+        if is_vrm0:
             vrm_extension_dic["exporterVersion"] = self.exporter_name()
         vrm_extension_dic["specVersion"] = self.vrm_version
         # region meta
         vrm_extension_dic["meta"] = vrm_meta_dic = {}
         # 安全側に寄せておく
-        if self.vrm_version.startswith("0."):
+        if is_vrm0:
             required_vrm_metas = vrm_types.Vrm0.REQUIRED_METAS
             vrm_metas = vrm_types.Vrm0.METAS
         else:
@@ -1372,65 +1378,16 @@ class GlbObj:
                 vrm_meta_dic["texture"] = len(self.json_dic["textures"]) - 1
         # endregion meta
         # region humanoid
-        if self.vrm_version.startswith("0."):
-            vrm_extension_dic["humanoid"] = vrm_humanoid_dic = {"humanBones": []}
-            node_name_id_dic = {
-                node["name"]: i for i, node in enumerate(self.json_dic["nodes"])
-            }
-            for humanbone in (
-                vrm_types.HumanBones.requires + vrm_types.HumanBones.defines
-            ):
-                if (
-                    humanbone in self.armature.data.keys()
-                    and self.armature.data[humanbone]
-                    and self.armature.data[humanbone] in node_name_id_dic
-                ):
-                    vrm_humanoid_dic["humanBones"].append(
-                        {
-                            "bone": humanbone,
-                            "node": node_name_id_dic[self.armature.data[humanbone]],
-                            # TODO min,max,center,axisLength : useDef(ry):Trueなら不要な気がするのでほっとく
-                            "useDefaultValues": True,
-                        }
-                    )
-            vrm_humanoid_dic.update(
-                json.loads(
-                    self.textblock2str(
-                        bpy.data.texts[self.armature["humanoid_params"]]
-                    ),
-                    object_pairs_hook=OrderedDict,
-                )
-            )
+        node_name_id_dic = {node["name"]: i for i, node in enumerate(nodes)}
+        if is_vrm0:
+            vrm_extension_dic["humanoid"] = self.vrm0_humanoid_dic(node_name_id_dic)
         else:
-            vrm_extension_dic["humanoid"] = vrm_humanoid_dic = {"humanBones": {}}
-            node_name_id_dic = {
-                node["name"]: i for i, node in enumerate(self.json_dic["nodes"])
-            }
-            for humanbone in (
-                vrm_types.HumanBones.requires + vrm_types.HumanBones.defines
-            ):
-                if (
-                    humanbone in self.armature.data.keys()
-                    and self.armature.data[humanbone]
-                    and self.armature.data[humanbone] in node_name_id_dic
-                ):
-                    vrm_humanoid_dic["humanBones"].update(
-                        {
-                            humanbone: {
-                                "node": node_name_id_dic[self.armature.data[humanbone]]
-                            }
-                        }
-                    )
+            vrm_extension_dic["humanoid"] = self.vrm1_humanoid_dic(node_name_id_dic)
 
         # endregion humanoid
         # region firstPerson
         vrm_extension_dic["firstPerson"] = vrm_fp_dic = {}
-        vrm_fp_dic.update(
-            json.loads(
-                self.textblock2str(bpy.data.texts[self.armature["firstPerson_params"]]),
-                object_pairs_hook=OrderedDict,
-            )
-        )
+        vrm_fp_dic.update(self.armature_textblock_json("firstPerson_params"))
         if (
             "firstPersonBone" in vrm_fp_dic.keys()
             and vrm_fp_dic["firstPersonBone"] != -1
@@ -1438,115 +1395,88 @@ class GlbObj:
             vrm_fp_dic["firstPersonBone"] = node_name_id_dic[
                 vrm_fp_dic["firstPersonBone"]
             ]
+        mesh_name_id_dic = {mesh["name"]: i for i, mesh in enumerate(meshes)}
         if "meshAnnotations" in vrm_fp_dic.keys():
             for mesh_annotation in vrm_fp_dic["meshAnnotations"]:
-                mesh_annotation["mesh"] = [
-                    i
-                    for i, mesh in enumerate(self.json_dic["meshes"])
-                    if mesh["name"] == mesh_annotation["mesh"]
-                ][0]
+                mesh_annotation["mesh"] = mesh_name_id_dic[mesh_annotation["mesh"]]
                 # TODO VRM1.0 is using node index that has mesh
         # TODO
-        if self.vrm_version.startswith("1."):
+        if is_vrm1:
             vrm_extension_dic["lookAt"] = vrm_look_at_dic = {}
-            vrm_look_at_dic.update(
-                json.loads(
-                    self.textblock2str(bpy.data.texts[self.armature["lookat_params"]]),
-                    object_pairs_hook=OrderedDict,
-                )
-            )
+            vrm_look_at_dic.update(self.armature_textblock_json("lookat_params"))
 
         # endregion firstPerson
         # region blendShapeMaster
-        blendshape_group_name = (
-            "blendShapeMaster" if self.vrm_version.startswith("0.") else "blendShape"
-        )
+        blendshape_group_name = "blendShapeMaster" if is_vrm0 else "blendShape"
         vrm_extension_dic[blendshape_group_name] = vrm_blend_shape_groups_dic = {}
-        blend_shape_groups = json.loads(
-            self.textblock2str(bpy.data.texts[self.armature["blendshape_group"]]),
-            object_pairs_hook=OrderedDict,
-        )
+        blend_shape_groups = self.armature_textblock_json("blendshape_group")
 
         # meshを名前からid
         # weightを0-1から0-100に
         # shape_indexを名前からindexに
-        def clamp(min_val, val, max_val):
-            if max_val >= val:
-                if val >= min_val:
-                    return val
-                print(
-                    "blendshapeGroup weight is between 0 and 1, value is {}".format(val)
-                )
-                return min_val
-            print("blendshapeGroup weight is between 0 and 1, value is {}".format(val))
-            return max_val
-
+        max_weight = 100 if is_vrm0 else 1
+        material_name_id_dic = {mat["name"]: i for i, mat in enumerate(materials)}
         for blend_shape_group in blend_shape_groups:
             for bind in blend_shape_group["binds"]:
                 # TODO VRM1.0 is using node index that has mesh
-                bind["mesh"] = [
-                    i
-                    for i, mesh in enumerate(self.json_dic["meshes"])
-                    if mesh["name"] == bind["mesh"]
-                ][0]
-                bind["index"] = self.json_dic["meshes"][bind["mesh"]]["primitives"][0][
-                    "extras"
-                ]["targetNames"].index(bind["index"])
-                bind["weight"] = (
-                    clamp(0, bind["weight"] * 100, 100)
-                    if self.vrm_version.startswith("0.")
-                    else clamp(0, bind["weight"], 1)
-                )
-            if self.vrm_version.startswith("1."):
+                bind["mesh"] = mesh_name_id_dic[bind["mesh"]]
+                target_names = meshes[bind["mesh"]]["primitives"][0]["extras"][
+                    "targetNames"
+                ]
+                bind["index"] = target_names.index(bind["index"])
+                weight = bind["weight"] * 100 if is_vrm0 else bind["weight"]
+                # NaN is also out of range and becomes the maximum
+                if not 0 <= weight <= max_weight:
+                    print(
+                        "blendshapeGroup weight is between 0 and 1, value is {}".format(
+                            weight
+                        )
+                    )
+                    weight = 0 if weight < 0 else max_weight
+                bind["weight"] = weight
+            if is_vrm1:
                 for matval in blend_shape_group["materialValues"]:
-                    matval["material"] = [
-                        i
-                        for i, mat in enumerate(self.json_dic["materials"])
-                        if mat["name"] == matval["material"]
-                    ][0]
+                    matval["material"] = material_name_id_dic[matval["material"]]
         # TODO isBinary handle : 0 or 1 にするフラグ
         vrm_blend_shape_groups_dic["blendShapeGroups"] = blend_shape_groups
         # endregion blendShapeMaster
 
         # region secondaryAnimation
-        springbone_name = (
-            "springBone" if self.vrm_version.startswith("1.") else "secondaryAnimation"
-        )
+        springbone_name = "springBone" if is_vrm1 else "secondaryAnimation"
         vrm_extension_dic[springbone_name] = {"boneGroups": [], "colliderGroups": []}
 
         # region colliderGroups
         # armatureの子emptyを変換する
         collider_group_list = []
-        empty_dic = {
-            node_name_id_dic[ch.parent_bone]: []
-            for ch in self.armature.children
-            if ch.type == "EMPTY"
-        }
-        for child_empty in [ch for ch in self.armature.children if ch.type == "EMPTY"]:
-            empty_dic[node_name_id_dic[child_empty.parent_bone]].append(child_empty)
+        empty_dic = {}
+        for ch in self.armature.children:
+            if ch.type == "EMPTY":
+                empty_dic.setdefault(node_name_id_dic[ch.parent_bone], []).append(ch)
+        armature_location = self.armature.location
+        bones = self.armature.data.bones
         for node_id, empty_objs in empty_dic.items():
             collider_group = {"node": node_id, "colliders": []}
             colliders = collider_group["colliders"]
             for empty in empty_objs:
                 collider = {}
-                empty_offset_pos = [
-                    empty.matrix_world.to_translation()[i]
-                    - self.armature.location[i]
-                    - self.armature.data.bones[empty.parent_bone].head_local[i]
-                    for i in range(3)
+                empty_location = empty.matrix_world.to_translation()
+                bone_head = bones[empty.parent_bone].head_local
+                # The offset from the bone head, converted with axis_blender_to_glb
+                empty_offset = [
+                    -(empty_location[0] - armature_location[0] - bone_head[0]),
+                    empty_location[2] - armature_location[2] - bone_head[2],
+                    empty_location[1] - armature_location[1] - bone_head[1],
                 ]
-                if self.vrm_version.startswith("0."):
+                if is_vrm0:
                     collider["radius"] = empty.empty_display_size
-                    collider["offset"] = OrderedDict(
-                        zip(
-                            ("x", "y", "z"),
-                            self.axis_blender_to_glb(empty_offset_pos),
-                        )
-                    )
-                    collider["offset"]["z"] = collider["offset"]["z"] * -1
+                    collider["offset"] = {
+                        "x": empty_offset[0],
+                        "y": empty_offset[1],
+                        "z": -empty_offset[2],
+                    }
                 else:
                     collider["size"] = [empty.empty_display_size]
-                    collider["offset"] = self.axis_blender_to_glb(empty_offset_pos)
+                    collider["offset"] = empty_offset
                     collider["shapeType"] = "sphere"
                 colliders.append(collider)
             collider_group_list.append(collider_group)
@@ -1557,28 +1487,27 @@ class GlbObj:
         # region boneGroup
         # ボーン名からnode_idに
         # collider_groupも名前からcolliderGroupのindexに直す
-        collider_node_id_list = [c_g["node"] for c_g in collider_group_list]
-        bone_groups = json.loads(
-            self.textblock2str(bpy.data.texts[self.armature["spring_bone"]]),
-            object_pairs_hook=OrderedDict,
-        )
+        collider_group_id_dic = {
+            c_g["node"]: i for i, c_g in enumerate(collider_group_list)
+        }
+        bone_groups = self.armature_textblock_json("spring_bone")
         for bone_group in bone_groups:
             bone_group["bones"] = [
                 node_name_id_dic[name] for name in bone_group["bones"]
             ]
             bone_group["colliderGroups"] = [
-                collider_node_id_list.index(node_name_id_dic[name])
+                collider_group_id_dic[node_name_id_dic[name]]
                 for name in bone_group["colliderGroups"]
             ]
         vrm_extension_dic[springbone_name]["boneGroups"] = bone_groups
         # endregion boneGroup
         # endregion secondaryAnimation
-        extension_name = "VRM" if self.vrm_version.startswith("0.") else "VRMC_vrm"
+        extension_name = "VRM" if is_vrm0 else "VRMC_vrm"
         self.json_dic["extensions"][extension_name].update(vrm_extension_dic)
         # endregion vrm_extension
 
         # region secondary
-        self.json_dic["nodes"].append(
+        nodes.append(
             {
                 "name": "secondary",
                 "translation": [0.0, 0.0, 0.0],
@@ -1586,30 +1515,35 @@ class GlbObj:
                 "scale": [1.0, 1.0, 1.0],
             }
         )
-        self.json_dic["scenes"][0]["nodes"].append(len(self.json_dic["nodes"]) - 1)
+        self.json_dic["scenes"][0]["nodes"].append(len(nodes) - 1)
 
-    def finalize(self):
+    def finalize(self) -> List[bytes]:
         bin_json, self.bin = self.glb_bin_collector.pack_all()
         self.json_dic.update(bin_json)
         magic = b"glTF" + struct.pack("<I", 2)
-        json_str = json.dumps(self.json_dic).encode("utf-8")
+        # The dict tree is built here and has no reference cycles
+        json_str = (
+            json.JSONEncoder(check_circular=False).encode(self.json_dic).encode("utf-8")
+        )
         if len(json_str) % 4 != 0:
             json_str += b"\x20" * (4 - len(json_str) % 4)
         json_size = struct.pack("<I", len(json_str))
-        if len(self.bin) % 4 != 0:
-            for _ in range(4 - len(self.bin) % 4):
-                self.bin += b"\x00"
-        bin_size = struct.pack("<I", len(self.bin))
+        # Written as its own chunk so the large binary is not copied to pad it
+        bin_padding = b"\x00" * (-len(self.bin) % 4)
+        bin_length = len(self.bin) + len(bin_padding)
+        bin_size = struct.pack("<I", bin_length)
         total_size = struct.pack(
-            "<I", len(json_str) + len(self.bin) + 28
+            "<I", len(json_str) + bin_length + 28
         )  # include header size
-        self.result = (
-            magic
-            + total_size
-            + json_size
-            + b"JSON"
-            + json_str
-            + bin_size
-            + b"BIN\x00"
-            + self.bin
-        )
+        # Kept as separate chunks so the whole GLB is never concatenated in memory
+        return [
+            magic,
+            total_size,
+            json_size,
+            b"JSON",
+            json_str,
+            bin_size,
+            b"BIN\x00",
+            self.bin,
+            bin_padding,
+        ]
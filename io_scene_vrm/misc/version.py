@@ -1,3 +1,8 @@
+from functools import lru_cache
+from typing import Tuple
+
+
 # To avoid circular reference
-def version() -> str:
+@lru_cache(maxsize=None)
+def version() -> Tuple[int, int, int]:
     return __import__(".".join(__name__.split(".")[:-3])).bl_info["version"]
@@ -52,7 +52,7 @@ class Bones_rename(bpy.types.Operator):  # noqa: N801
                 for i, collider in enumerate(jdic["colliderGroups"]):
                     jdic["colliderGroups"][i] = reprstr(collider)
             textblock.from_string(json.dumps(j, indent=4))
-        for bonename in vrm_types.HumanBones.requires + vrm_types.HumanBones.defines:
+        for bonename in vrm_types.HumanBones.all_bones:
             if bonename in bpy.context.active_object.data:
                 bpy.context.active_object.data[bonename] = reprstr(
                     bpy.context.active_object.data[bonename]
@@ -586,8 +586,7 @@ class WM_OT_vrmValidatorPrivate(bpy.types.Operator):  # noqa: N801
                     return None
                 try:
                     json_as_dict = json.loads(
-                        "".join([line.body for line in bpy.data.texts[text_key].lines]),
-                        object_pairs_hook=OrderedDict,
+                        "".join([line.body for line in bpy.data.texts[text_key].lines])
                     )
                 except json.JSONDecodeError as e:
                     messages.append(
@@ -114,13 +114,13 @@ class HumanBones:
     right_leg_req = ["rightUpperLeg", "rightLowerLeg", "rightFoot"]
     right_arm_req = ["rightUpperArm", "rightLowerArm", "rightHand"]
 
-    requires = [
+    requires = (
         *center_req[:],
         *left_leg_req[:],
         *right_leg_req[:],
         *left_arm_req[:],
         *right_arm_req[:],
-    ]
+    )
 
     left_arm_def = [
         "leftShoulder",
@@ -162,7 +162,7 @@ class HumanBones:
     center_def = ["upperChest", "jaw"]
     left_leg_def = ["leftToes"]
     right_leg_def = ["rightToes"]
-    defines = [
+    defines = (
         "leftEye",
         "rightEye",
         *center_def[:],
@@ -170,7 +170,8 @@ class HumanBones:
         *right_leg_def[:],
         *left_arm_def[:],
         *right_arm_def[:],
-    ]
+    )
+    all_bones = requires + defines
     # child:parent
     hierarchy = {
         # 体幹
@@ -287,12 +288,16 @@ class MaterialTransparentZWrite(Material):
     ]
     texture_index_list = ["_MainTex"]
     vector_props = ["_Color"]
+    # Initial values copied by each instance
+    float_props_dic_template = dict.fromkeys(float_props)
+    vector_props_dic_template = dict.fromkeys(vector_props)
+    texture_index_dic_template = dict.fromkeys(texture_index_list)
 
     def __init__(self):
         super().__init__()
-        self.float_props_dic = {prop: None for prop in self.float_props}
-        self.vector_props_dic = {prop: None for prop in self.vector_props}
-        self.texture_index_dic = {tex: None for tex in self.texture_index_list}
+        self.float_props_dic = self.float_props_dic_template.copy()
+        self.vector_props_dic = self.vector_props_dic_template.copy()
+        self.texture_index_dic = self.texture_index_dic_template.copy()
 
 
 class MaterialMtoon(Material):
@@ -366,30 +371,39 @@ class MaterialMtoon(Material):
         "MTOON_DEBUG_LITSHADERATE",
     ]
     tagmap_list = ["RenderType"]
+    # Initial values copied by each instance
+    float_props_dic_template = dict.fromkeys(float_props_exchange_dic)
+    vector_props_dic_template = dict.fromkeys(vector_props_exchange_dic)
+    texture_index_dic_template = dict.fromkeys(texture_kind_exchange_dic)
+    keyword_dic_template = dict.fromkeys(keyword_list, False)
+    tag_dic_template = dict.fromkeys(tagmap_list)
 
     def __init__(self):
         super().__init__()
-        self.float_props_dic = {prop: None for prop in self.float_props_exchange_dic}
-        self.vector_props_dic = {prop: None for prop in self.vector_props_exchange_dic}
-        self.texture_index_dic = {prop: None for prop in self.texture_kind_exchange_dic}
-        self.keyword_dic = {kw: False for kw in self.keyword_list}
-        self.tag_dic = {tag: None for tag in self.tagmap_list}
+        self.float_props_dic = self.float_props_dic_template.copy()
+        self.vector_props_dic = self.vector_props_dic_template.copy()
+        self.texture_index_dic = self.texture_index_dic_template.copy()
+        self.keyword_dic = self.keyword_dic_template.copy()
+        self.tag_dic = self.tag_dic_template.copy()
 
 
 def nested_json_value_getter(target_dict, attr_list, default=None):
-    _result = default
-    if isinstance(target_dict, (dict, list)):
-        _attr = attr_list.pop(0)
-        if (isinstance(target_dict, list) and len(target_dict) > abs(_attr)) or (
-            isinstance(target_dict, dict) and target_dict.get(_attr) is not None
-        ):
-            if attr_list:
-                _result = nested_json_value_getter(
-                    target_dict[_attr], attr_list, default
-                )
-            else:
-                _result = target_dict[_attr]
-    return _result
+    result = target_dict
+    for attr in attr_list:
+        if isinstance(result, list):
+            if len(result) <= abs(attr):
+                return default
+            result = result[attr]
+        elif isinstance(result, dict):
+            result = result.get(attr)
+            if result is None:
+                return default
+        else:
+            return default
+    return result
+
+
+gl_float_vec4_struct = struct.Struct("<ffff")
 
 
 def normalize_weights_compatible_with_gl_float(weights):
@@ -397,16 +411,19 @@ def normalize_weights_compatible_with_gl_float(weights):
         return weights
 
     def to_gl_float(array4):
-        return list(struct.unpack("<ffff", struct.pack("<ffff", *array4)))
+        return list(gl_float_vec4_struct.unpack(gl_float_vec4_struct.pack(*array4)))
 
     # Simulate export and import
     weights = to_gl_float(weights)
+    weights_sum = sum(weights)
     for _ in range(10):
-        next_weights = to_gl_float([weights[i] / sum(weights) for i in range(4)])
-        error = abs(1 - sum(weights))
-        next_error = abs(1 - sum(next_weights))
+        next_weights = to_gl_float([weights[i] / weights_sum for i in range(4)])
+        next_weights_sum = sum(next_weights)
+        error = abs(1 - weights_sum)
+        next_error = abs(1 - next_weights_sum)
         if error >= float_info.epsilon and error > next_error:
             weights = next_weights
+            weights_sum = next_weights_sum
         else:
             break
 
@@ -0,0 +1,41 @@
+import struct
+from unittest import TestCase
+
+from io_scene_vrm.gl_constants import GlConstants
+from io_scene_vrm.importer.binary_reader import BinaryReader
+
+
+class TestBinaryReader(TestCase):
+    def test_read_as_data_type_array(self):
+        for data_type, format_char, values in [
+            (GlConstants.UNSIGNED_INT, "I", (0, 1, 0xFFFFFFFF)),
+            (GlConstants.INT, "i", (-0x80000000, -1, 0x7FFFFFFF)),
+            (GlConstants.UNSIGNED_SHORT, "H", (0, 1, 0xFFFF)),
+            (GlConstants.SHORT, "h", (-0x8000, -1, 0x7FFF)),
+            (GlConstants.FLOAT, "f", (-1.5, 0.0, 0.25)),
+            (GlConstants.UNSIGNED_BYTE, "B", (0, 1, 0xFF)),
+        ]:
+            with self.subTest(format_char):
+                data = b"\xaa" * 3 + struct.pack(f"<3{format_char}", *values) + b"\xbb"
+                reader = BinaryReader(data)
+                reader.set_pos(3)
+                self.assertEqual(values, reader.read_as_data_type_array(data_type, 3))
+                self.assertEqual(len(data) - 1, reader.pos)
+
+                reader.set_pos(3)
+                expected = tuple(reader.read_as_data_type(data_type) for _ in values)
+                self.assertEqual(len(data) - 1, reader.pos)
+                reader.set_pos(3)
+                self.assertEqual(expected, reader.read_as_data_type_array(data_type, 3))
+
+    def test_read_as_data_type_array_empty(self):
+        reader = BinaryReader(b"\x01\x02\x03\x04")
+        reader.set_pos(2)
+        self.assertEqual((), reader.read_as_data_type_array(GlConstants.FLOAT, 0))
+        self.assertEqual(2, reader.pos)
+
+    def test_read_as_data_type_array_unsupported_type(self):
+        reader = BinaryReader(b"\x01\x02\x03\x04")
+        with self.assertRaises(Exception):
+            reader.read_as_data_type_array(GlConstants.BYTE, 1)
+        self.assertEqual(0, reader.pos)
@@ -0,0 +1,40 @@
+import json
+from sys import float_info
+from unittest import TestCase
+
+import numpy
+
+from io_scene_vrm.misc.glb_factory import GlbObj
+
+
+def compare_one_by_one_min_max(positions):
+    fmin, fmax = -float_info.max, float_info.max
+    minmax = [[fmax, fmax, fmax], [fmin, fmin, fmin]]
+    for position in positions:
+        for i in range(3):
+            minmax[0][i] = position[i] if position[i] < minmax[0][i] else minmax[0][i]
+            minmax[1][i] = position[i] if position[i] > minmax[1][i] else minmax[1][i]
+    return minmax
+
+
+class TestGlbFactory(TestCase):
+    def test_vec3_min_max(self):
+        nan = float("nan")
+        inf = float("inf")
+        random_positions = (
+            numpy.random.RandomState(0).uniform(-2, 2, (100, 3)).astype(numpy.float32)
+        )
+        for name, positions in [
+            ("empty", []),
+            ("single", [[1.0, -2.0, 0.5]]),
+            ("random", random_positions.tolist()),
+            ("signed zeros", [[0.0, -0.0, 0.0], [-0.0, 0.0, -0.0]]),
+            ("nan", [[nan, 1.0, nan], [2.0, nan, nan], [-1.0, 3.0, nan]]),
+            ("inf", [[inf, -inf, 1.0], [-inf, inf, 2.0]]),
+            ("float max", [[float_info.max, -float_info.max, 0.0]]),
+        ]:
+            with self.subTest(name):
+                vectors = numpy.array(positions, dtype=numpy.float64).reshape(-1, 3)
+                expected = compare_one_by_one_min_max(positions)
+                actual = GlbObj.vec3_min_max(vectors)
+                self.assertEqual(json.dumps(expected), json.dumps(actual))
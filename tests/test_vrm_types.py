@@ -19,3 +19,23 @@ class TestVrmTypes(TestCase):
                 self.assertEqual(
                     expected, actual, f"Expected: {expected}, Actual: {actual}"
                 )
+
+    def test_nested_json_value_getter(self):
+        json_dict = {"a": [{"b": 1}, None], "c": None, "d": 0}
+        for attr_list, default, expected in [
+            (["a", 0, "b"], None, 1),
+            (["a", 2], "x", "x"),
+            (["a", 1], "x", None),
+            (["a", 1, "b"], "x", "x"),
+            (["c"], "x", "x"),
+            (["d"], "x", 0),
+            (["d", "e"], "x", "x"),
+            (["e"], None, None),
+        ]:
+            with self.subTest(attr_list):
+                attr_list_copy = list(attr_list)
+                actual = vrm_types.nested_json_value_getter(
+                    json_dict, attr_list, default
+                )
+                self.assertEqual(expected, actual)
+                self.assertEqual(attr_list_copy, attr_list)